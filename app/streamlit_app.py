@@ -2,6 +2,10 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import joblib
+import orjson
+import json
+import csv
+import pickle
 import os
 import matplotlib.pyplot as plt
 
@@ -218,16 +222,40 @@ st.markdown("""
 # --- Constants ---
 MODEL_PATH = 'models/best_model_lgbm.pkl'
 FEATURE_NAMES_PATH = 'data/features/feature_names.csv'
-
-# Helper to load features
-@st.cache_data
+FEATURE_NAMES_PICKLE_PATH = 'models/feature_names.pkl'
+
+# LightGBM margin-based early stopping for single-row scoring. For a binary
+# model the margin is 2 * |raw score|, so 10.0 only stops once P(default) is
+# below ~0.7% or above ~99.3% -- well clear of the 0.2 / 0.5 risk boundaries.
+# One row gains nothing from the thread pool, so predict single-threaded.
+PREDICT_PARAMS = {
+    'num_threads': 1,
+    'pred_early_stop': True,
+    'pred_early_stop_freq': 10,
+    'pred_early_stop_margin': 10.0,
+}
+
+# Helper to load features (immutable tuple, shared across sessions)
+@st.cache_resource
 def load_feature_names():
-    if os.path.exists(FEATURE_NAMES_PATH):
-        df = pd.read_csv(FEATURE_NAMES_PATH)
-        return df['feature'].tolist()
-    return []
+    # Pickled tuple written by src/recreate_scaling.py; no parsing needed.
+    # Only trusted while at least as new as the CSV, so a regenerated CSV wins.
+    csv_exists = os.path.exists(FEATURE_NAMES_PATH)
+    if os.path.exists(FEATURE_NAMES_PICKLE_PATH) and (
+            not csv_exists
+            or os.path.getmtime(FEATURE_NAMES_PICKLE_PATH) >= os.path.getmtime(FEATURE_NAMES_PATH)):
+        with open(FEATURE_NAMES_PICKLE_PATH, 'rb') as f:
+            return pickle.load(f)
+    if csv_exists:
+        # Only one column is needed, so skip pandas' parser and type inference
+        with open(FEATURE_NAMES_PATH, newline='') as f:
+            reader = csv.reader(f)
+            col = next(reader).index('feature')
+            return tuple(row[col] for row in reader)
+    return ()
 
 EXPECTED_FEATURES = load_feature_names()
+FEATURE_INDEX = {feat: i for i, feat in enumerate(EXPECTED_FEATURES)}
 
 # Helper to load medians
 @st.cache_data
@@ -235,28 +263,108 @@ def load_medians():
     path = 'data/processed/feature_medians.json'
     if os.path.exists(path):
         try:
-            with open(path, 'r') as f:
-                import json
-                return json.load(f)
-        except:
+            with open(path, 'rb') as f:
+                raw = f.read()
+        except OSError:
             return {}
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass
+        # Files written by the old json.dump spell NaN medians as a bare NaN
+        # token, which orjson rejects; the stdlib parser accepts it
+        try:
+            return json.loads(raw)
+        except ValueError as e:
+            st.warning(f"Could not read {path}, prediction defaults fall back to 0: {e}")
     return {}
 
+@st.cache_resource
+def load_median_vector():
+    """Median defaults laid out in EXPECTED_FEATURES order (shared, read-only)."""
+    medians = load_medians()
+    values = (medians.get(feat, 0.0) for feat in EXPECTED_FEATURES)
+    # orjson stores NaN medians as null; keep them NaN so the imputer handles them
+    vec = np.fromiter((np.nan if v is None else v for v in values),
+                      dtype=np.float32, count=len(EXPECTED_FEATURES))
+    vec.flags.writeable = False
+    return vec
+
+# --- Categorical Mappings (selectbox option -> one-hot feature) ---
+GENDER_MAP = {
+    "ชาย (Male)": "CODE_GENDER_M",
+}
+EDUCATION_MAP = {
+    "มัธยมศึกษา (Secondary)": "NAME_EDUCATION_TYPE_Secondary / secondary special",
+    "ปริญญาตรี (Higher education)": "NAME_EDUCATION_TYPE_Higher education",
+    "ไม่จบปริญญาตรี (Incomplete higher)": "NAME_EDUCATION_TYPE_Incomplete higher",
+    "มัธยมต้น (Lower secondary)": "NAME_EDUCATION_TYPE_Lower secondary",
+    "ปริญญาโทขึ้นไป (Academic degree)": "NAME_EDUCATION_TYPE_Academic degree",
+}
+FAMILY_MAP = {
+    "แต่งงานแล้ว (Married)": "NAME_FAMILY_STATUS_Married",
+    "โสด (Single / not married)": "NAME_FAMILY_STATUS_Single / not married",
+    "จดทะเบียนสมรส (Civil marriage)": "NAME_FAMILY_STATUS_Civil marriage",
+    "หม้าย (Widow)": "NAME_FAMILY_STATUS_Widow",
+    "หย่าร้าง/แยกกันอยู่ (Separated)": "NAME_FAMILY_STATUS_Separated",
+}
+HOUSING_MAP = {
+    "บ้าน/อพาร์ทเมนท์ส่วนตัว": "NAME_HOUSING_TYPE_House / apartment",
+    "อยู่กับพ่อแม่": "NAME_HOUSING_TYPE_With parents",
+    "ที่พักของเทศบาล": "NAME_HOUSING_TYPE_Municipal apartment",
+    "เช่าอพาร์ทเมนท์": "NAME_HOUSING_TYPE_Rented apartment",
+    "ที่พักสวัสดิการ": "NAME_HOUSING_TYPE_Office apartment",
+    "คอนโด/สหกรณ์": "NAME_HOUSING_TYPE_Co-op apartment",
+}
+INCOME_MAP = {
+    "มนุษย์เงินเดือน (Working)": "NAME_INCOME_TYPE_Working",
+    "ข้าราชการ/รัฐวิสาหกิจ (State servant)": "NAME_INCOME_TYPE_State servant",
+    "ผู้รับบำนาญ (Pensioner)": "NAME_INCOME_TYPE_Pensioner",
+    "พนักงานบริษัทเอกชน (Commercial associate)": "NAME_INCOME_TYPE_Commercial associate",
+}
+OCCUPATION_MAP = {
+    "แรงงานทั่วไป (Laborers)": "OCCUPATION_TYPE_Laborers",
+    "พนักงานหลัก/เจ้าหน้าที่ (Core staff)": "OCCUPATION_TYPE_Core staff",
+    "บัญชี (Accountants)": "OCCUPATION_TYPE_Accountants",
+    "ผู้จัดการ (Managers)": "OCCUPATION_TYPE_Managers",
+    "คนขับรถ (Drivers)": "OCCUPATION_TYPE_Drivers",
+    "พนักงานขาย (Sales staff)": "OCCUPATION_TYPE_Sales staff",
+    "ไอที (IT staff)": "OCCUPATION_TYPE_IT staff",
+}
+ORG_MAP = {
+    "ธุรกิจส่วนตัว/นิติบุคคล (Business Entity Type 3)": "ORGANIZATION_TYPE_Business Entity Type 3",
+    "อาชีพอิสระ (Self-employed)": "ORGANIZATION_TYPE_Self-employed",
+    "ไม่ระบุ (XNA)": "ORGANIZATION_TYPE_XNA",
+}
+
 # --- Helper Functions ---
 @st.cache_resource
 def load_model():
     """Load the trained model and preprocessing artifacts from disk."""
     try:
         model = joblib.load(MODEL_PATH)
-        imputer = joblib.load('models/imputer.joblib')
-        scaler = joblib.load('models/scaler.joblib')
-        return model, imputer, scaler
+        # Score through the native Booster; the sklearn wrapper is not needed
+        # (a pickled raw lgb.Booster is used as is)
+        booster = getattr(model, 'booster_', model)
+        # Fitted arrays are memory-mapped and paged in on demand
+        imputer = joblib.load('models/imputer.joblib', mmap_mode='r')
+        scaler = joblib.load('models/scaler.joblib', mmap_mode='r')
+
+        # RobustScaler.transform is (X - center_) / scale_; keep it as a
+        # single multiply so one row never goes through sklearn.
+        n_features = scaler.n_features_in_
+        center = scaler.center_ if scaler.center_ is not None else np.zeros(n_features)
+        scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+        scaler_center = np.asarray(center, dtype=np.float32)
+        scaler_inv_scale = (1.0 / np.asarray(scale)).astype(np.float32)
     except FileNotFoundError as e:
         st.error(f"Error loading artifacts: {e}")
-        return None, None, None
+        return None, None, None, None
     except Exception as e:
         st.error(f"Unexpected error loading model: {e}")
-        return None, None, None
+        return None, None, None, None
+
+    return booster, imputer, scaler_center, scaler_inv_scale
 
 
 def get_risk_html(probability):
@@ -287,15 +395,48 @@ def get_risk_html(probability):
         """
 
 
+def predict_default_probability(booster, X):
+    """Default probability for a single preprocessed row."""
+    # The native Booster skips the sklearn wrapper's validation and
+    # DataFrame handling; for a binary model it returns P(class 1).
+    return float(booster.predict(X, num_iteration=booster.best_iteration,
+                                 **PREDICT_PARAMS)[0])
+
+
+def set_feature(vec, name, value):
+    """Write a value into the input vector if the model uses that feature."""
+    idx = FEATURE_INDEX.get(name)
+    if idx is not None:
+        vec[idx] = value
+
+
+DERIVED_FEATURES = (
+    'CREDIT_TO_ANNUITY_RATIO', 'CREDIT_TO_GOODS_RATIO', 'EMPLOYMENT_TO_AGE_RATIO',
+    'EXT_SOURCE_MEAN', 'EXT_SOURCE_STD', 'EXT_SOURCE_MIN', 'EXT_SOURCE_MAX',
+)
+
+
+def derive_features(credit, annuity, goods_price, age, employment_years, ext_1, ext_2, ext_3):
+    """Domain features from the raw inputs, in DERIVED_FEATURES order."""
+    # Plain scalar math: NumPy dispatch costs more than the work on 3 values
+    credit_to_annuity = credit / annuity if annuity > 0 else 0.0
+    credit_to_goods = credit / goods_price if goods_price > 0 else 0.0
+    employment_to_age = employment_years / age if age > 0 else 0.0
+    ext_mean = (ext_1 + ext_2 + ext_3) / 3
+    ext_var = ((ext_1 - ext_mean) ** 2 + (ext_2 - ext_mean) ** 2 + (ext_3 - ext_mean) ** 2) / 3
+    return (credit_to_annuity, credit_to_goods, employment_to_age,
+            ext_mean, ext_var ** 0.5, min(ext_1, ext_2, ext_3), max(ext_1, ext_2, ext_3))
+
+
 # --- Main Logic ---
 def main():
     st.title("Credit Scoring System")
     st.markdown('<p class="subtitle">ระบบประเมินความน่าจะเป็นที่ลูกค้าจะผิดนัดชำระหนี้ &mdash; กรอกข้อมูลผู้ขอสินเชื่อที่แถบด้านซ้ายเพื่อดูผลลัพธ์</p>', unsafe_allow_html=True)
 
-    model, imputer, scaler = load_model()
-    medians = load_medians()
+    booster, imputer, scaler_center, scaler_inv_scale = load_model()
+    median_vector = load_median_vector()
     
-    if model is None:
+    if booster is None:
         st.error("ไม่พบไฟล์โมเดลหรือไฟล์ประกอบสำคัญ กรุณาตรวจสอบโฟลเดอร์ models/")
         st.stop()
 
@@ -347,86 +488,58 @@ def main():
     if st.button("วิเคราะห์ความเสี่ยง", type="primary", use_container_width=True):
         with st.spinner("กำลังประมวลผล..."):
             
-            # Initialize input dict with MEDIANS for robustness
-            input_dict = {feat: medians.get(feat, 0) for feat in EXPECTED_FEATURES}
+            # Initialize input vector with MEDIANS for robustness
+            vec = median_vector.copy()
             
             # --- Map User Inputs to Features ---
             
             # Numeric Mappings
-            input_dict['AMT_CREDIT'] = credit_amount
-            input_dict['AMT_GOODS_PRICE'] = goods_price
-            input_dict['DAYS_BIRTH'] = age * -365
-            input_dict['DAYS_EMPLOYED'] = employment_years * -365
-            input_dict['EXT_SOURCE_1'] = ext_source_1
-            input_dict['EXT_SOURCE_2'] = ext_source_2
-            input_dict['EXT_SOURCE_3'] = ext_source_3
+            set_feature(vec, 'AMT_CREDIT', credit_amount)
+            set_feature(vec, 'AMT_GOODS_PRICE', goods_price)
+            set_feature(vec, 'DAYS_BIRTH', age * -365)
+            set_feature(vec, 'DAYS_EMPLOYED', employment_years * -365)
+            set_feature(vec, 'EXT_SOURCE_1', ext_source_1)
+            set_feature(vec, 'EXT_SOURCE_2', ext_source_2)
+            set_feature(vec, 'EXT_SOURCE_3', ext_source_3)
             
-            input_dict['REGION_RATING_CLIENT'] = region_rating
-            input_dict['REGION_RATING_CLIENT_W_CITY'] = region_rating
-            input_dict['FLAG_WORK_PHONE'] = 1 if work_phone else 0
+            set_feature(vec, 'REGION_RATING_CLIENT', region_rating)
+            set_feature(vec, 'REGION_RATING_CLIENT_W_CITY', region_rating)
+            set_feature(vec, 'FLAG_WORK_PHONE', 1 if work_phone else 0)
             
             # Derived Domain Features
-            input_dict['CREDIT_TO_ANNUITY_RATIO'] = credit_amount / annuity if annuity > 0 else 0
-            input_dict['CREDIT_TO_GOODS_RATIO'] = credit_amount / goods_price if goods_price > 0 else 0
-            input_dict['AGE_YEARS'] = age
-            input_dict['EMPLOYMENT_YEARS'] = employment_years
-            input_dict['EMPLOYMENT_TO_AGE_RATIO'] = employment_years / age if age > 0 else 0
-            
-            ext_list = [ext_source_1, ext_source_2, ext_source_3]
-            input_dict['EXT_SOURCE_MEAN'] = np.mean(ext_list)
-            input_dict['EXT_SOURCE_STD'] = np.std(ext_list)
-            input_dict['EXT_SOURCE_MIN'] = np.min(ext_list)
-            input_dict['EXT_SOURCE_MAX'] = np.max(ext_list)
+            set_feature(vec, 'AGE_YEARS', age)
+            set_feature(vec, 'EMPLOYMENT_YEARS', employment_years)
+            derived = derive_features(credit_amount, annuity, goods_price, age, employment_years,
+                                      ext_source_1, ext_source_2, ext_source_3)
+            for name, value in zip(DERIVED_FEATURES, derived):
+                set_feature(vec, name, value)
+            credit_to_annuity, ext_mean = derived[0], derived[3]
 
             # Categorical Mappings (One-Hot)
-            if 'ชาย' in gender: input_dict['CODE_GENDER_M'] = 1
-            if own_car: input_dict['FLAG_OWN_CAR_Y'] = 1
-            
-            if 'มัธยมศึกษา' in education: input_dict['NAME_EDUCATION_TYPE_Secondary / secondary special'] = 1
-            elif 'ปริญญาตรี' in education: input_dict['NAME_EDUCATION_TYPE_Higher education'] = 1
-            
-            if 'แต่งงานแล้ว' in family_status: input_dict['NAME_FAMILY_STATUS_Married'] = 1
-            elif 'โสด' in family_status: input_dict['NAME_FAMILY_STATUS_Single / not married'] = 1
-            
-            if 'บ้าน/อพาร์ทเมนท์ส่วนตัว' in housing_type: input_dict['NAME_HOUSING_TYPE_House / apartment'] = 1
-            elif 'อยู่กับพ่อแม่' in housing_type: input_dict['NAME_HOUSING_TYPE_With parents'] = 1
-            
-            if 'เจ้าหน้าที่' in occupation: input_dict['OCCUPATION_TYPE_Core staff'] = 1
-            elif 'คนขับรถ' in occupation: input_dict['OCCUPATION_TYPE_Drivers'] = 1
-            elif 'แรงงาน' in occupation: input_dict['OCCUPATION_TYPE_Low-skill Laborers'] = 1
-            
-            if 'ธุรกิจส่วนตัว' in org_type: input_dict['ORGANIZATION_TYPE_Business Entity Type 3'] = 1
-            elif 'อาชีพอิสระ' in org_type: input_dict['ORGANIZATION_TYPE_Self-employed'] = 1
-            elif 'ไม่ระบุ' in org_type: input_dict['ORGANIZATION_TYPE_XNA'] = 1
-            
-            if 'มนุษย์เงินเดือน' in income_type: input_dict['NAME_INCOME_TYPE_Working'] = 1
-            elif 'ข้าราชการ' in income_type: input_dict['NAME_INCOME_TYPE_State servant'] = 1
-            elif 'บำนาญ' in income_type: input_dict['NAME_INCOME_TYPE_Pensioner'] = 1
-            elif 'เอกชน' in income_type: input_dict['NAME_INCOME_TYPE_Commercial associate'] = 1
+            if own_car: set_feature(vec, 'FLAG_OWN_CAR_Y', 1)
+            for option, mapping in ((gender, GENDER_MAP), (education, EDUCATION_MAP),
+                                    (family_status, FAMILY_MAP), (housing_type, HOUSING_MAP),
+                                    (occupation, OCCUPATION_MAP), (org_type, ORG_MAP),
+                                    (income_type, INCOME_MAP)):
+                flag = mapping.get(option)
+                if flag:
+                    set_feature(vec, flag, 1)
 
-            # Convert to DataFrame
             try:
-                model_features = EXPECTED_FEATURES
-                aligned_input = {feat: input_dict.get(feat, 0) for feat in model_features}
-                df_predict = pd.DataFrame([aligned_input])
-                
                 # Preprocessing
-                if imputer:
-                    df_predict_imputed = pd.DataFrame(imputer.transform(df_predict), columns=df_predict.columns)
-                else:
-                    df_predict_imputed = df_predict
+                # vec starts from the medians and every input writes a concrete
+                # value, so it only holds NaNs if a stored median was NaN.
+                if imputer and np.isnan(vec).any():
+                    df_predict = pd.DataFrame(vec.reshape(1, -1), columns=EXPECTED_FEATURES, copy=False)
+                    vec = imputer.transform(df_predict)[0].astype(np.float32)
                     
-                if scaler:
-                    try:
-                        df_predict_scaled = pd.DataFrame(scaler.transform(df_predict_imputed), columns=df_predict.columns)
-                    except ValueError as ve:
-                        print(f"Scaling warning: {ve}") 
-                        df_predict_scaled = df_predict_imputed
-                else:
-                    df_predict_scaled = df_predict_imputed
+                # The whole inference path stays float32 (vector, scaler
+                # parameters, imputer output); the Booster accepts float32
+                # buffers directly, so no float64 conversion copy is made.
+                scaled = (vec - scaler_center) * scaler_inv_scale
                 
                 # Prediction
-                probability = model.predict_proba(df_predict_scaled)[:, 1][0]
+                probability = predict_default_probability(booster, scaled.reshape(1, -1))
                 
                 # Credit Score (300-850 scale, inverse to risk)
                 credit_score = int(850 - (probability * 550))
@@ -458,11 +571,11 @@ def main():
                     
                     factor_col1, factor_col2, factor_col3 = st.columns(3)
                     with factor_col1:
-                        st.metric("Ext Source Mean", f"{input_dict['EXT_SOURCE_MEAN']:.3f}")
+                        st.metric("Ext Source Mean", f"{ext_mean:.3f}")
                     with factor_col2:
                         st.metric("Employment Years", f"{employment_years}")
                     with factor_col3:
-                        st.metric("Credit/Annuity Ratio", f"{input_dict['CREDIT_TO_ANNUITY_RATIO']:.1f}")
+                        st.metric("Credit/Annuity Ratio", f"{credit_to_annuity:.1f}")
 
             except Exception as e:
                 st.error(f"เกิดข้อผิดพลาดในการประมวลผล: {str(e)}")
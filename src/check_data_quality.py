@@ -1,19 +1,40 @@
 import pandas as pd
 import numpy as np
 
+def column_stats(arr):
+    """
+    Per-column max and missing fraction of a 2-D float array.
+
+    Both reductions run directly on the raw ndarray instead of going
+    through pandas per column. NaNs are ignored by the max (all-NaN
+    columns give NaN, like pandas). A frame without rows gives NaN for both.
+    """
+    if arr.shape[0] == 0:
+        empty = np.full(arr.shape[1], np.nan)
+        return empty, empty.copy()
+    col_max = np.fmax.reduce(arr, axis=0)
+    nan_frac = np.isnan(arr).mean(axis=0)
+    return col_max, nan_frac
+
 def check_data():
-    print("Loading train_processed.csv...")
+    print("Loading train_processed.parquet...")
     try:
-        df = pd.read_csv('data/processed/train_processed.csv')
+        df = pd.read_parquet('data/processed/train_processed.parquet')
     except FileNotFoundError:
-        print("Error: data/processed/train_processed.csv not found.")
+        print("Error: data/processed/train_processed.parquet not found.")
         return
 
     print(f"Data Shape: {df.shape}")
     
+    # Single scan over the numeric block for all per-column stats below
+    num_cols = df.select_dtypes(include=[np.number]).columns
+    # float64 so the reported maxima are exact; nullable dtypes map NA to NaN
+    col_max, nan_frac = column_stats(df[num_cols].to_numpy(dtype=np.float64, na_value=np.nan))
+    col_max = pd.Series(col_max, index=num_cols)
+    
     # 1. Check DAYS_EMPLOYED anomaly
-    if 'DAYS_EMPLOYED' in df.columns:
-        max_days = df['DAYS_EMPLOYED'].max()
+    if 'DAYS_EMPLOYED' in col_max.index:
+        max_days = col_max['DAYS_EMPLOYED']
         print(f"\n1. DAYS_EMPLOYED Check:")
         print(f"   Max Value: {max_days}")
         if max_days > 365000:
@@ -24,8 +45,8 @@ def check_data():
             print("   [PASS] Anomaly 365243 seems removed (Max value reasonable or NaN).")
     
     # 2. Check Income Outliers
-    if 'AMT_INCOME_TOTAL' in df.columns:
-        max_inc = df['AMT_INCOME_TOTAL'].max()
+    if 'AMT_INCOME_TOTAL' in col_max.index:
+        max_inc = col_max['AMT_INCOME_TOTAL']
         print(f"\n2. Income Check:")
         print(f"   Max Income: {max_inc:,.2f}")
         if max_inc > 10000000:
@@ -33,11 +54,14 @@ def check_data():
             
     # 3. Missing Values
     print(f"\n3. Missing Value Summary:")
-    missing = df.isnull().mean()
-    high_missing = missing[missing > 0.5]
+    # Numeric columns come from the ndarray scan; only the rest go through pandas
+    other_missing = df.drop(columns=num_cols).isnull().mean()
+    high_missing = num_cols[np.flatnonzero(nan_frac > 0.5)].union(
+        other_missing.index[other_missing > 0.5], sort=False)
+    high_missing = df.columns[df.columns.isin(high_missing)]
     print(f"   Columns with > 50% missing: {len(high_missing)}")
     if len(high_missing) > 0:
-        print(f"   Examples: {high_missing.index.tolist()[:5]}")
+        print(f"   Examples: {high_missing.tolist()[:5]}")
         
     # 4. Target Imbalance
     if 'TARGET' in df.columns:
@@ -1,23 +1,27 @@
 
 import pandas as pd
+import numpy as np
 import joblib
-import json
+import orjson
 
 def main():
     print("Loading training data...")
     try:
-        df = pd.read_csv('data/processed/train_cleaned.csv')
+        df = pd.read_csv('data/processed/train_cleaned.csv', engine='pyarrow')
     except Exception as e:
         print(f"Error loading data: {e}")
         return
 
     print("Computing medians...")
-    # Compute median for all numeric columns
-    medians = df.median(numeric_only=True).to_dict()
+    # Compute median for all numeric columns in one call on a float32 block
+    num_df = df.select_dtypes(include=[np.number, 'bool'])
+    arr = num_df.to_numpy(dtype=np.float32, na_value=np.nan)
+    meds = np.nanmedian(arr, axis=0)
+    medians = dict(zip(num_df.columns, meds.tolist()))
     
     # Save to JSON for App to load
-    with open('data/processed/feature_medians.json', 'w') as f:
-        json.dump(medians, f)
+    with open('data/processed/feature_medians.json', 'wb') as f:
+        f.write(orjson.dumps(medians))
         
     print(f"Saved {len(medians)} medians to data/processed/feature_medians.json")
     
@@ -1,79 +1,116 @@
 import pandas as pd
 import numpy as np
 import os
+import hashlib
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
 
 # Identify categorical columns (object type)
 def get_categorical_columns(df):
     return df.select_dtypes(include=['object']).columns.tolist()
 
-def impute_missing_values(df):
+def impute_missing_values(df, copy=True, num_cols=None, cat_cols=None):
     """
     Impute missing values in the dataframe.
     - Numeric columns: Median
     - Categorical columns: Mode (most frequent) or a specific placeholder string
+    Pass copy=False to fill the given dataframe in place, and num_cols/cat_cols
+    to reuse a dtype split the caller already has.
     """
     print("Imputing missing values...")
-    df_imputed = df.copy()
-    
-    # numeric imputation
-    numeric_cols = df_imputed.select_dtypes(include=[np.number]).columns
-    for col in numeric_cols:
-        if df_imputed[col].isnull().any():
-            median_val = df_imputed[col].median()
-            df_imputed[col].fillna(median_val, inplace=True)
+    df_imputed = df.copy() if copy else df
+    
+    # numeric imputation (one median pass, one block-wise fillna)
+    if num_cols is None:
+        num_cols = df_imputed.select_dtypes(include=[np.number]).columns
+    df_imputed[num_cols] = df_imputed[num_cols].fillna(df_imputed[num_cols].median())
             
     # categorical imputation
-    cat_cols = df_imputed.select_dtypes(include=['object']).columns
-    for col in cat_cols:
-        if df_imputed[col].isnull().any():
-            # Use mode, or a placeholder like 'Unknown'
-            # For simplicity, using mode
-            if not df_imputed[col].mode().empty:
-                mode_val = df_imputed[col].mode()[0]
-                df_imputed[col].fillna(mode_val, inplace=True)
-            else:
-                df_imputed[col].fillna("Unknown", inplace=True)
+    if cat_cols is None:
+        cat_cols = get_categorical_columns(df_imputed)
+    has_missing = df_imputed[cat_cols].isnull().any()
+    missing_cat_cols = has_missing.index[has_missing.to_numpy()]
+    modes = {}
+    for col in missing_cat_cols:
+        # Use mode, or a placeholder like 'Unknown' if the column is all null
+        mode = df_imputed[col].mode()
+        modes[col] = mode.iat[0] if not mode.empty else "Unknown"
+    df_imputed.fillna(modes, inplace=True)
                 
     return df_imputed
 
-def encode_features(df):
+def encode_features(df, copy=True, cat_cols=None):
     """
     Encode categorical features.
     - 2 categories: Label Encoding (0/1)
     - >2 categories: One-Hot Encoding
+    Pass copy=False to label-encode the given dataframe in place
+    (one-hot encoding always returns a new dataframe), and cat_cols to
+    reuse a list of categorical columns the caller already has.
     """
     print("Encoding categorical features...")
-    df_encoded = df.copy()
+    df_encoded = df.copy() if copy else df
     le_count = 0
     
-    cat_cols = get_categorical_columns(df_encoded)
+    if cat_cols is None:
+        cat_cols = get_categorical_columns(df_encoded)
     
+    # One categorical cast; the category count then replaces a unique() scan
+    df_encoded[cat_cols] = df_encoded[cat_cols].astype('category')
+    ohe_cols = []
     for col in cat_cols:
-        # Label Encode if 2 or fewer unique values
-        if len(df_encoded[col].unique()) <= 2:
-            # Simple factorization
-            df_encoded[col], _ = pd.factorize(df_encoded[col])
+        # Label Encode if 2 or fewer values; a missing value counts as one,
+        # as it did with unique(), so it is never label-encoded to -1
+        n_levels = df_encoded[col].cat.categories.size + df_encoded[col].hasnans
+        if n_levels <= 2:
+            # Codes follow the sorted categories, so train and test agree
+            df_encoded[col] = df_encoded[col].cat.codes.astype(np.int8)
             le_count += 1
+        else:
+            ohe_cols.append(col)
     
     # One-Hot Encode the rest
-    df_encoded = pd.get_dummies(df_encoded)
+    df_encoded = pd.get_dummies(df_encoded, columns=ohe_cols)
     
     print(f"{le_count} columns were label encoded.")
     print(f"Total columns after one-hot encoding: {df_encoded.shape[1]}")
     
     return df_encoded
 
-def load_data(data_dir):
+# Columns the aggregation steps actually use (IDs + numeric features of the
+# Home Credit schema); passed to load_data so the parser skips the string columns
+AGG_USECOLS = {
+    "bureau.csv": [
+        "SK_ID_CURR", "DAYS_CREDIT", "CREDIT_DAY_OVERDUE", "DAYS_CREDIT_ENDDATE",
+        "DAYS_ENDDATE_FACT", "AMT_CREDIT_MAX_OVERDUE", "CNT_CREDIT_PROLONG",
+        "AMT_CREDIT_SUM", "AMT_CREDIT_SUM_DEBT", "AMT_CREDIT_SUM_LIMIT",
+        "AMT_CREDIT_SUM_OVERDUE", "DAYS_CREDIT_UPDATE", "AMT_ANNUITY",
+    ],
+    "previous_application.csv": [
+        "SK_ID_CURR", "AMT_ANNUITY", "AMT_APPLICATION", "AMT_CREDIT",
+        "AMT_DOWN_PAYMENT", "AMT_GOODS_PRICE", "HOUR_APPR_PROCESS_START",
+        "NFLAG_LAST_APPL_IN_DAY", "RATE_DOWN_PAYMENT", "RATE_INTEREST_PRIMARY",
+        "RATE_INTEREST_PRIVILEGED", "DAYS_DECISION", "SELLERPLACE_AREA",
+        "CNT_PAYMENT", "DAYS_FIRST_DRAWING", "DAYS_FIRST_DUE",
+        "DAYS_LAST_DUE_1ST_VERSION", "DAYS_LAST_DUE", "DAYS_TERMINATION",
+        "NFLAG_INSURED_ON_APPROVAL",
+    ],
+}
+
+def load_data(data_dir, usecols=None):
     """
     Load all datasets from the specified directory.
     
     Args:
         data_dir (str): Path to the directory containing raw CSV files.
+        usecols (dict, optional): Maps a file name to the columns to read;
+            files not listed are read in full.
         
     Returns:
         dict: A dictionary containing pandas DataFrames for each dataset.
     """
     data = {}
+    usecols = usecols or {}
     files = [
         "application_train.csv",
         "application_test.csv",
@@ -90,8 +127,23 @@ def load_data(data_dir):
         file_path = os.path.join(data_dir, file)
         if os.path.exists(file_path):
             key = file.replace(".csv", "")
-            print(f"Loading {file}...")
-            data[key] = pd.read_csv(file_path)
+            columns = usecols.get(file)
+            # Columnar Feather copy written on first load; reused while newer than the CSV.
+            # Column subsets get their own cache, keyed by a hash of the column list,
+            # so neither a full read nor an edited list is served a stale subset.
+            if columns:
+                key_suffix = "." + hashlib.sha1(",".join(columns).encode()).hexdigest()[:12]
+            else:
+                key_suffix = ""
+            cache_path = os.path.join(data_dir, key + key_suffix + ".feather")
+            if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(file_path):
+                print(f"Loading {file} (cached)...")
+                data[key] = pd.read_feather(cache_path)
+            else:
+                print(f"Loading {file}...")
+                # Arrow's parser is multithreaded C++; dtypes match the default engine
+                data[key] = pd.read_csv(file_path, engine="pyarrow", usecols=columns)
+                data[key].to_feather(cache_path, compression="zstd")
         else:
             print(f"Warning: {file} not found in {data_dir}")
             
@@ -107,23 +159,48 @@ def clean_application_data(df):
     Returns:
         pd.DataFrame: Cleaned dataframe.
     """
+    # The only copy in the pipeline; later steps work on df_clean in place
     df_clean = df.copy()
     
     # 1. Handle DAYS_EMPLOYED anomaly
     # 365243 days is often used as a placeholder for null/retired in this dataset
-    df_clean['DAYS_EMPLOYED'].replace(365243, np.nan, inplace=True)
+    # One scan builds the mask used for both the flag and the replacement
+    anom_mask = df_clean['DAYS_EMPLOYED'].to_numpy() == 365243
+    df_clean['DAYS_EMPLOYED'] = df_clean['DAYS_EMPLOYED'].mask(anom_mask)
     
     # 2. Flag for potential anomalies (optional but good practice)
-    df_clean['DAYS_EMPLOYED_ANOM'] = (df['DAYS_EMPLOYED'] == 365243)
+    df_clean['DAYS_EMPLOYED_ANOM'] = anom_mask
+    
+    # Split the columns by dtype once; imputation keeps dtypes, so both steps share it
+    num_cols = df_clean.select_dtypes(include=[np.number]).columns
+    cat_cols = get_categorical_columns(df_clean)
     
     # 3. Impute Missing Values
-    df_clean = impute_missing_values(df_clean)
+    df_clean = impute_missing_values(df_clean, copy=False, num_cols=num_cols, cat_cols=cat_cols)
 
     # 4. Categorical encoding
-    df_clean = encode_features(df_clean)
+    df_clean = encode_features(df_clean, copy=False, cat_cols=cat_cols)
     
     return df_clean
 
+# Statistics computed for every numeric column of the secondary tables
+AGG_STATS = ['count', 'mean', 'max', 'min', 'sum']
+
+def downcast_numeric(df, cols):
+    """
+    Shrink the given numeric columns in place to the narrowest dtype.
+    - Integers: smallest unsigned/signed integer type for their range
+    - Floats: float32
+    Narrower blocks halve the bytes the groupby kernels have to read.
+    """
+    for col in cols:
+        if pd.api.types.is_integer_dtype(df[col]):
+            downcast = 'unsigned' if df[col].min() >= 0 else 'integer'
+            df[col] = pd.to_numeric(df[col], downcast=downcast)
+        elif pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype(np.float32)
+    return df
+
 def preprocess_bureau_data(bureau):
     """
     Preprocess and aggregate bureau data.
@@ -143,44 +220,57 @@ def preprocess_bureau_data(bureau):
     # SK_ID_BUREAU is ID, dropping it. SK_ID_CURR is grouping key.
     cols_to_agg = [c for c in numeric_cols if c != 'SK_ID_BUREAU' and c != 'SK_ID_CURR']
     
-    bureau_agg = bureau.groupby('SK_ID_CURR')[cols_to_agg].agg(['count', 'mean', 'max', 'min', 'sum']).reset_index()
-    
-    # Rename columns
-    columns = ['SK_ID_CURR']
-    for col in bureau_agg.columns.levels[0]:
-        if col != 'SK_ID_CURR':
-            for stat in bureau_agg.columns.levels[1][:-1]: # excluding the empty string from index
-                columns.append('BUREAU_%s_%s' % (col, stat))
+    # Work on a narrowed copy of just the columns being aggregated
+    bureau = bureau[['SK_ID_CURR'] + cols_to_agg].copy()
+    downcast_numeric(bureau, cols_to_agg)
     
-    bureau_agg.columns = columns
+    # Named aggregation produces the flat BUREAU_<col>_<stat> names directly
+    agg_spec = {'BUREAU_%s_%s' % (col, stat): (col, stat) for col in cols_to_agg for stat in AGG_STATS}
+    # Kept indexed by SK_ID_CURR, ready for the join in merge_data
+    bureau_agg = bureau.groupby('SK_ID_CURR').agg(**agg_spec)
     return bureau_agg
 
 def preprocess_previous_applications(prev_app):
     """
     Preprocess and aggregate previous application data.
+    Returns the aggregates with SK_ID_CURR as index.
     """
     print("Preprocessing previous applications...")
     
     # Select numeric columns
     numeric_cols = prev_app.select_dtypes(include=[np.number]).columns.tolist()
     cols_to_agg = [c for c in numeric_cols if c != 'SK_ID_PREV' and c != 'SK_ID_CURR']
-
-    # Simple numeric aggregation
-    prev_agg = prev_app.groupby('SK_ID_CURR')[cols_to_agg].agg(['count', 'mean', 'max', 'min', 'sum']).reset_index()
     
-    # Rename columns (flatten MultiIndex)
-    prev_agg.columns = ['SK_ID_CURR'] + ['PREV_' + '_'.join(col).strip('_') for col in prev_agg.columns.values if col[0] != 'SK_ID_CURR']
+    # Work on a narrowed copy of just the columns being aggregated
+    prev_app = prev_app[['SK_ID_CURR'] + cols_to_agg].copy()
+    downcast_numeric(prev_app, cols_to_agg)
+
+    # Simple numeric aggregation (named, so columns come out flat)
+    agg_spec = {'PREV_%s_%s' % (col, stat): (col, stat) for col in cols_to_agg for stat in AGG_STATS}
+    prev_agg = prev_app.groupby('SK_ID_CURR').agg(**agg_spec)
     
     return prev_agg
 
+def build_feature_table(*aggs):
+    """
+    Align SK_ID_CURR-indexed aggregate tables on a shared, sorted index.
+    Returns None if no aggregates are given.
+    """
+    feature_dfs = [agg for agg in aggs if agg is not None]
+    if not feature_dfs:
+        return None
+    return pd.concat(feature_dfs, axis=1).sort_index()
+
 def merge_data(app_data, bureau_agg, prev_agg):
     """
     Merge aggregated features into the main application dataset.
     """
     print("Merging datasets...")
-    df = app_data.merge(bureau_agg, on='SK_ID_CURR', how='left')
-    df = df.merge(prev_agg, on='SK_ID_CURR', how='left')
-    return df
+    features = build_feature_table(bureau_agg, prev_agg)
+    if features is None:
+        return app_data
+    # One index join against the pre-aligned table instead of chained merges
+    return app_data.join(features, on='SK_ID_CURR', how='left')
 
 def main():
     # Paths relative to the project root (where the script is executed)
@@ -192,46 +282,53 @@ def main():
         
     # 1. Load Data
     # Only loading necessary files to save memory if needed, but load_data loads all.
-    # We'll use the existing load_data.
-    data = load_data(DATA_DIR)
+    # Secondary tables are read with just the columns their aggregation uses.
+    data = load_data(DATA_DIR, usecols=AGG_USECOLS)
     
-    # 2. Clean Application Data
-    print("Cleaning application data...")
-    if 'application_train' in data:
-        df_train = clean_application_data(data['application_train'])
-    if 'application_test' in data:
-        df_test = clean_application_data(data['application_test'])
+    # 2. Clean Application Data / 3. Preprocess Secondary Tables
+    # The four steps are independent until the merge, so each runs in its own
+    # process. spawn starts clean workers instead of forking the BLAS/Arrow
+    # thread pools of this process.
+    print("Cleaning application data and preprocessing secondary tables...")
+    steps = {
+        'application_train': clean_application_data,
+        'application_test': clean_application_data,
+        'bureau': preprocess_bureau_data,
+        'previous_application': preprocess_previous_applications,
+    }
+    with ProcessPoolExecutor(max_workers=len(steps), mp_context=mp.get_context("spawn")) as executor:
+        futures = {key: executor.submit(step, data[key]) for key, step in steps.items() if key in data}
+        results = {key: future.result() for key, future in futures.items()}
     
-    # 3. Preprocess Secondary Tables
-    bureau_agg = None
-    if 'bureau' in data:
-        bureau_agg = preprocess_bureau_data(data['bureau'])
-        
-    prev_agg = None
-    if 'previous_application' in data:
-        prev_agg = preprocess_previous_applications(data['previous_application'])
+    df_train = results.get('application_train')
+    df_test = results.get('application_test')
+    bureau_agg = results.get('bureau')
+    prev_agg = results.get('previous_application')
         
     # 4. Merge
-    print("Merging training data...")
-    feature_dfs = [df for df in [bureau_agg, prev_agg] if df is not None]
+    # Secondary aggregates are aligned once and joined in a single pass per frame
+    features = build_feature_table(bureau_agg, prev_agg)
     
     if 'application_train' in data:
+        print("Merging training data...")
         df_train_merged = df_train
-        for feat_df in feature_dfs:
-            df_train_merged = df_train_merged.merge(feat_df, on='SK_ID_CURR', how='left')
+        if features is not None:
+            df_train_merged = df_train_merged.join(features, on='SK_ID_CURR', how='left')
         
         print(f"Saving train data to {PROCESSED_DIR}...")
-        df_train_merged.to_csv(os.path.join(PROCESSED_DIR, "train_processed.csv"), index=False)
+        df_train_merged.to_parquet(os.path.join(PROCESSED_DIR, "train_processed.parquet"), engine="pyarrow",
+                                   compression="zstd", row_group_size=64_000, index=False)
         print(f"Train shape: {df_train_merged.shape}")
 
     if 'application_test' in data:
         print("Merging test data...")
         df_test_merged = df_test
-        for feat_df in feature_dfs:
-            df_test_merged = df_test_merged.merge(feat_df, on='SK_ID_CURR', how='left')
+        if features is not None:
+            df_test_merged = df_test_merged.join(features, on='SK_ID_CURR', how='left')
             
         print(f"Saving test data to {PROCESSED_DIR}...")
-        df_test_merged.to_csv(os.path.join(PROCESSED_DIR, "test_processed.csv"), index=False)
+        df_test_merged.to_parquet(os.path.join(PROCESSED_DIR, "test_processed.parquet"), engine="pyarrow",
+                                  compression="zstd", row_group_size=64_000, index=False)
         print(f"Test shape: {df_test_merged.shape}")
         
     print("Data processing complete.")
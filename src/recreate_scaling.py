@@ -2,32 +2,63 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import RobustScaler, OneHotEncoder
 from sklearn.impute import SimpleImputer
+from sklearn.pipeline import make_pipeline
 import joblib
+import pickle
 import os
 
-def create_features(df):
-    """Recreate the feature engineering steps specific to the selected features."""
-    df_new = df.copy()
+def row_stats(arr):
+    """Row-wise NaN-skipping mean, sample std (ddof=1), min and max of a 2-D array.
+
+    All four come from one validity mask and one mean instead of four
+    separate nan-reductions; rows without enough values give NaN, like pandas.
+    """
+    valid = ~np.isnan(arr)
+    count = valid.sum(axis=1)
+    filled = np.where(valid, arr, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = filled.sum(axis=1) / count
+        sq_dev = np.where(valid, filled - mean[:, None], 0.0) ** 2
+        std = np.where(count > 1, np.sqrt(sq_dev.sum(axis=1) / (count - 1)), np.nan)
+    # fmin/fmax ignore NaN and return NaN only for all-NaN rows
+    return mean, std, np.fmin.reduce(arr, axis=1), np.fmax.reduce(arr, axis=1)
+
+def create_features(df, copy=True):
+    """Recreate the feature engineering steps specific to the selected features.
+
+    Pass copy=False to add the columns to the given dataframe in place.
+    """
+    df_new = df.copy() if copy else df
     
-    # Ratios
+    # Ratios and time features in one fused expression (numexpr when installed)
     # Safety +1 to avoid div by zero, matching notebook logic
-    df_new['CREDIT_TO_ANNUITY_RATIO'] = df_new['AMT_CREDIT'] / (df_new['AMT_ANNUITY'] + 1)
-    df_new['CREDIT_TO_GOODS_RATIO'] = df_new['AMT_CREDIT'] / (df_new['AMT_GOODS_PRICE'] + 1)
-    
-    # Time features
-    df_new['AGE_YEARS'] = -df_new['DAYS_BIRTH'] / 365
-    df_new['EMPLOYMENT_YEARS'] = -df_new['DAYS_EMPLOYED'] / 365
-    df_new['EMPLOYMENT_TO_AGE_RATIO'] = df_new['EMPLOYMENT_YEARS'] / (df_new['AGE_YEARS'] + 1)
+    df_new.eval("""
+        CREDIT_TO_ANNUITY_RATIO = AMT_CREDIT / (AMT_ANNUITY + 1)
+        CREDIT_TO_GOODS_RATIO = AMT_CREDIT / (AMT_GOODS_PRICE + 1)
+        AGE_YEARS = -DAYS_BIRTH / 365
+        EMPLOYMENT_YEARS = -DAYS_EMPLOYED / 365
+        EMPLOYMENT_TO_AGE_RATIO = EMPLOYMENT_YEARS / (AGE_YEARS + 1)
+    """, inplace=True)
     
     # External Sources Stats
     ext_cols = ['EXT_SOURCE_1', 'EXT_SOURCE_2', 'EXT_SOURCE_3']
-    df_new['EXT_SOURCE_MEAN'] = df_new[ext_cols].mean(axis=1)
-    df_new['EXT_SOURCE_STD'] = df_new[ext_cols].std(axis=1)
-    df_new['EXT_SOURCE_MIN'] = df_new[ext_cols].min(axis=1)
-    df_new['EXT_SOURCE_MAX'] = df_new[ext_cols].max(axis=1)
+    ext = df_new[ext_cols].to_numpy(dtype=np.float64)
+    (df_new['EXT_SOURCE_MEAN'], df_new['EXT_SOURCE_STD'],
+     df_new['EXT_SOURCE_MIN'], df_new['EXT_SOURCE_MAX']) = row_stats(ext)
     
     return df_new
 
+def replace_atomically(path, write):
+    """Call write(tmp_path) and move the result over path in one rename.
+
+    The running app memory-maps the joblib artifacts; truncating them in place
+    would corrupt (or SIGBUS) its cached arrays, while os.replace leaves the
+    old file alive for existing mappings.
+    """
+    tmp_path = path + '.tmp'
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
 def main():
     print("Loading data...")
     try:
@@ -40,7 +71,7 @@ def main():
 
     print("Generating features...")
     # 1. Generate Domain Features
-    df_fe = create_features(train_df)
+    df_fe = create_features(train_df, copy=False)
     
     # 2. Categorical Encoding (Get Dummies)
     # We need to ensure we have columns like 'CODE_GENDER_M', 'NAME_FAMILY_STATUS_Married'
@@ -50,39 +81,44 @@ def main():
     df_encoded = pd.get_dummies(df_fe, columns=cat_cols, drop_first=True)
     
     # 3. Align with Expected Features
-    # Create empty dataframe with expected columns
-    df_final = pd.DataFrame(columns=expected_features)
-    
-    # Fill shared columns
-    common_cols = list(set(df_encoded.columns) & set(expected_features))
-    df_final[common_cols] = df_encoded[common_cols]
+    # One reindex selects, orders and adds the missing columns (filled with 0,
+    # standard for OHE) while keeping each column's dtype
+    df_final = df_encoded.reindex(columns=expected_features, fill_value=0)
     
-    # Fill missing columns with 0 (standard for OHE and safe for others validation)
+    # Remaining NaNs in shared columns were also set to 0 before fitting; keep
+    # that so the fitted imputer/scaler match the existing artifacts
     df_final = df_final.fillna(0)
     
-    # Ensure correct order
-    df_final = df_final[expected_features]
+    # float32 end to end: half the memory traffic of float64, and the app already
+    # scores in float32. Kept as a DataFrame so feature_names_in_ is still fitted.
+    df_final = df_final.astype(np.float32)
     
     print(f"Data aligned. Shape: {df_final.shape}")
     
     # 4. Impute & Scale
     print("Fitting Imputer and Scaler...")
     
-    # Fit Imputer (Median) - RobustScaler doesn't like NaNs
-    imputer = SimpleImputer(strategy='median')
-    X_imputed = imputer.fit_transform(df_final)
-    
-    # Fit Scaler (Robust)
-    scaler = RobustScaler()
-    X_scaled = scaler.fit_transform(X_imputed)
+    # Imputer (Median) first - RobustScaler doesn't like NaNs - then Scaler (Robust).
+    # With copy=False the scaler works in place on the imputer's output, so only
+    # one n x k array is allocated besides df_final.
+    pipe = make_pipeline(SimpleImputer(strategy='median', copy=False), RobustScaler(copy=False))
+    X_scaled = pipe.fit_transform(df_final)
+    imputer = pipe.named_steps['simpleimputer']
+    scaler = pipe.named_steps['robustscaler']
     
     # 5. Save Artifacts
     print("Saving artifacts...")
     os.makedirs('models', exist_ok=True)
-    joblib.dump(imputer, 'models/imputer.joblib')
-    joblib.dump(scaler, 'models/scaler.joblib')
+    replace_atomically('models/imputer.joblib', lambda path: joblib.dump(imputer, path))
+    replace_atomically('models/scaler.joblib', lambda path: joblib.dump(scaler, path))
+    
+    # Feature order as a pickled tuple so the app can skip CSV parsing
+    def dump_feature_names(path):
+        with open(path, 'wb') as f:
+            pickle.dump(tuple(expected_features), f, protocol=pickle.HIGHEST_PROTOCOL)
+    replace_atomically('models/feature_names.pkl', dump_feature_names)
     
-    print("Success! 'imputer.joblib' and 'scaler.joblib' saved to models/.")
+    print("Success! 'imputer.joblib', 'scaler.joblib' and 'feature_names.pkl' saved to models/.")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,6 @@
+import sys
+import os
+
+# Add src and app to path once so every test module can import the scripts
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
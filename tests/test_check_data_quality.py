@@ -0,0 +1,28 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+from check_data_quality import column_stats
+
+def _assert_matches_pandas(arr):
+    df = pd.DataFrame(arr)
+    col_max, nan_frac = column_stats(arr)
+    
+    np.testing.assert_array_equal(col_max, df.max().to_numpy(dtype=np.float64))
+    np.testing.assert_array_equal(nan_frac, df.isnull().mean().to_numpy(dtype=np.float64))
+
+def test_column_stats_mixed_and_all_nan_columns():
+    """NaNs are skipped by the max; an all-NaN column gives NaN like pandas."""
+    arr = np.array([
+        [1.0, np.nan, np.nan],
+        [4500000.45, 2.0, np.nan],
+        [np.nan, -3.0, np.nan],
+    ])
+    
+    _assert_matches_pandas(arr)
+
+def test_column_stats_no_rows():
+    """A frame without rows gives NaN for both stats instead of raising."""
+    arr = np.empty((0, 3))
+    
+    _assert_matches_pandas(arr)
@@ -0,0 +1,91 @@
+import pytest
+import pandas as pd
+import numpy as np
+
+from data_preprocessing import clean_application_data, encode_features, load_data, preprocess_bureau_data
+
+def test_clean_application_data_days_employed_anomaly():
+    """365243 is flagged, then replaced and imputed with the median of real values."""
+    df = pd.DataFrame({
+        'SK_ID_CURR': [1, 2, 3],
+        'DAYS_EMPLOYED': [-100, 365243, -300],
+    })
+    
+    df_clean = clean_application_data(df)
+    
+    assert df_clean['DAYS_EMPLOYED_ANOM'].tolist() == [False, True, False]
+    assert df_clean['DAYS_EMPLOYED'].tolist() == [-100.0, -200.0, -300.0]
+    # Input frame is left untouched
+    assert df['DAYS_EMPLOYED'].tolist() == [-100, 365243, -300]
+
+def test_clean_application_data_imputes_and_encodes():
+    """Missing categoricals get the mode before binary label encoding."""
+    df = pd.DataFrame({
+        'SK_ID_CURR': [1, 2, 3],
+        'DAYS_EMPLOYED': [-100, -200, -300],
+        'FLAG_OWN_CAR': ['Y', None, 'Y'],
+        'AMT_GOODS_PRICE': [1.0, np.nan, 3.0],
+    })
+    
+    df_clean = clean_application_data(df)
+    
+    assert df_clean['AMT_GOODS_PRICE'].tolist() == [1.0, 2.0, 3.0]
+    assert df_clean['FLAG_OWN_CAR'].nunique() == 1
+
+def test_encode_features_binary_codes_independent_of_row_order():
+    """Binary columns get sorted-category codes; wider ones are one-hot encoded."""
+    df = pd.DataFrame({
+        'FLAG_OWN_CAR': ['N', 'Y', 'Y'],
+        'NAME_EDUCATION_TYPE': ['Higher', 'Secondary', 'Lower'],
+    })
+    
+    encoded = encode_features(df)
+    reversed_encoded = encode_features(df.iloc[::-1])
+    
+    assert encoded['FLAG_OWN_CAR'].tolist() == [0, 1, 1]
+    # Reversed rows keep their own codes rather than first-seen order
+    assert reversed_encoded['FLAG_OWN_CAR'].tolist() == [1, 1, 0]
+    assert encoded['FLAG_OWN_CAR'].dtype == np.int8
+    assert list(encoded.columns) == ['FLAG_OWN_CAR', 'NAME_EDUCATION_TYPE_Higher',
+                                     'NAME_EDUCATION_TYPE_Lower', 'NAME_EDUCATION_TYPE_Secondary']
+
+def test_load_data_cache_follows_usecols(tmp_path):
+    """A changed column list is re-read from CSV, not served the cached subset."""
+    pd.DataFrame({'SK_ID_CURR': [1, 2], 'DAYS_CREDIT': [-10, -20], 'AMT_ANNUITY': [1.0, 2.0]}).to_csv(
+        tmp_path / 'bureau.csv', index=False)
+    
+    first = load_data(str(tmp_path), usecols={'bureau.csv': ['SK_ID_CURR', 'DAYS_CREDIT', 'AMT_ANNUITY']})
+    second = load_data(str(tmp_path), usecols={'bureau.csv': ['SK_ID_CURR', 'DAYS_CREDIT']})
+    full = load_data(str(tmp_path))
+    
+    assert list(first['bureau'].columns) == ['SK_ID_CURR', 'DAYS_CREDIT', 'AMT_ANNUITY']
+    assert list(second['bureau'].columns) == ['SK_ID_CURR', 'DAYS_CREDIT']
+    assert list(full['bureau'].columns) == ['SK_ID_CURR', 'DAYS_CREDIT', 'AMT_ANNUITY']
+
+def test_encode_features_counts_missing_as_a_level():
+    """Two categories plus NaN is three values, so the column is one-hot encoded."""
+    df = pd.DataFrame({'EMERGENCYSTATE_MODE': ['x', 'y', None]})
+    
+    encoded = encode_features(df)
+    
+    assert list(encoded.columns) == ['EMERGENCYSTATE_MODE_x', 'EMERGENCYSTATE_MODE_y']
+    assert encoded.to_numpy().sum(axis=1).tolist() == [1, 1, 0]
+
+def test_preprocess_bureau_data_sums_survive_downcast():
+    """Group sums beyond the narrowed dtype's range match the full-width result."""
+    bureau = pd.DataFrame({
+        'SK_ID_CURR': [1] * 40 + [2],
+        'SK_ID_BUREAU': np.arange(41),
+        'DAYS_CREDIT': [-2900] * 40 + [-5],  # fits int16, the group sum does not
+        'AMT_CREDIT_SUM': [1e6] * 41,
+    })
+    original = bureau.copy()
+    
+    bureau_agg = preprocess_bureau_data(bureau)
+    expected = original.groupby('SK_ID_CURR')['DAYS_CREDIT'].agg(['sum', 'mean', 'min'])
+    
+    assert bureau_agg['BUREAU_DAYS_CREDIT_sum'].tolist() == expected['sum'].tolist() == [-116000, -5]
+    assert bureau_agg['BUREAU_DAYS_CREDIT_mean'].tolist() == expected['mean'].tolist()
+    assert bureau_agg['BUREAU_DAYS_CREDIT_min'].tolist() == expected['min'].tolist()
+    # The caller's frame keeps its dtypes and values
+    pd.testing.assert_frame_equal(bureau, original)
@@ -1,11 +1,6 @@
 import pytest
 import pandas as pd
 import numpy as np
-import sys
-import os
-
-# Add src to path so we can import recreate_scaling
-sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from recreate_scaling import create_features
 
@@ -81,6 +76,27 @@ def test_create_features_ext_sources():
     assert df_new['EXT_SOURCE_MIN'][0] == 0.2
     assert df_new['EXT_SOURCE_MAX'][0] == 0.8
 
+def test_create_features_ext_sources_with_nan():
+    """External source stats skip NaNs the same way pandas does."""
+    data = {
+        'AMT_CREDIT': [10000.0] * 3,
+        'AMT_ANNUITY': [1000.0] * 3,
+        'AMT_GOODS_PRICE': [5000.0] * 3,
+        'DAYS_BIRTH': [-10000] * 3,
+        'DAYS_EMPLOYED': [-1000] * 3,
+        'EXT_SOURCE_1': [np.nan, 0.2, np.nan],
+        'EXT_SOURCE_2': [np.nan, np.nan, np.nan],
+        'EXT_SOURCE_3': [np.nan, 0.8, 0.4]
+    }
+    df = pd.DataFrame(data)
+    df_new = create_features(df)
+    
+    ext = df[['EXT_SOURCE_1', 'EXT_SOURCE_2', 'EXT_SOURCE_3']]
+    pd.testing.assert_series_equal(df_new['EXT_SOURCE_MEAN'], ext.mean(axis=1), check_names=False)
+    pd.testing.assert_series_equal(df_new['EXT_SOURCE_STD'], ext.std(axis=1), check_names=False)
+    pd.testing.assert_series_equal(df_new['EXT_SOURCE_MIN'], ext.min(axis=1), check_names=False)
+    pd.testing.assert_series_equal(df_new['EXT_SOURCE_MAX'], ext.max(axis=1), check_names=False)
+
 def test_create_features_preserves_rows():
     """Ensure row count check."""
     data = pd.DataFrame({
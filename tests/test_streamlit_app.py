@@ -0,0 +1,28 @@
+import pytest
+import numpy as np
+
+import streamlit_app
+
+def _write_medians(tmp_path, content):
+    medians_path = tmp_path / 'data' / 'processed' / 'feature_medians.json'
+    medians_path.parent.mkdir(parents=True)
+    medians_path.write_bytes(content)
+
+def test_load_medians_reads_legacy_nan_token(tmp_path, monkeypatch):
+    """Files from the old json.dump writer (bare NaN) still load."""
+    _write_medians(tmp_path, b'{"AMT_CREDIT": 513531.0, "EXT_SOURCE_1": NaN}')
+    monkeypatch.chdir(tmp_path)
+    streamlit_app.load_medians.clear()
+    
+    medians = streamlit_app.load_medians()
+    
+    assert medians['AMT_CREDIT'] == 513531.0
+    assert np.isnan(medians['EXT_SOURCE_1'])
+
+def test_load_medians_reads_orjson_null(tmp_path, monkeypatch):
+    """orjson writes NaN medians as null."""
+    _write_medians(tmp_path, b'{"AMT_CREDIT":513531.0,"EXT_SOURCE_1":null}')
+    monkeypatch.chdir(tmp_path)
+    streamlit_app.load_medians.clear()
+    
+    assert streamlit_app.load_medians() == {'AMT_CREDIT': 513531.0, 'EXT_SOURCE_1': None}